@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,13 +6,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from .src.routes import application_router
 from .src.settings import app_settings as settings
 from .src.logger import LoggerHandler, get_logger
+from .src.database import get_database_interface
+from .src.profiler import RequestProfiler
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI): # pylint: disable=unused-argument, redefined-outer-name
     app.state.logger_handler = LoggerHandler()
     app.state.logger_handler.log_lifespan()
+    db_interface = get_database_interface()
+    db_interface.ensure_process_engine()
+    sync_task = asyncio.create_task(db_interface.replica.run()) if db_interface.replica else None
     yield
+    if sync_task:
+        sync_task.cancel()
+        await asyncio.to_thread(db_interface.replica.push_pending) # best effort before shutting down
     app.state.logger_handler.log_lifespan(shutdown=True)
 
 app = FastAPI(
@@ -34,6 +43,10 @@ print(settings.allowed_headers)
 
 app.include_router(application_router)
 
+# Opt-in profiling: the middleware is only registered when enabled, so there is no per-request cost otherwise
+if settings.profiling_enabled:
+    app.middleware('http')(RequestProfiler(get_database_interface()).dispatch)
+
 @app.get('/api', include_in_schema=False)
 async def root():
     with get_logger(task='healthcheck') as logger:
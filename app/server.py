@@ -0,0 +1,72 @@
+import os
+import random
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+# Only settings and logger are imported here: the application (and its database engine) is
+# imported by each worker process, never by the supervisor
+from .src.settings import app_settings as settings, database_settings
+from .src.logger import get_logger
+
+
+class WorkerConfig(uvicorn.Config):
+    """
+    Uvicorn config that staggers worker recycling: load() runs in each worker process, so every
+    worker draws its own request limit and workers do not all restart at the same time
+    """
+    def __init__(self, *args, limit_max_requests_jitter: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit_max_requests_jitter = limit_max_requests_jitter
+
+    def load(self):
+        if self.limit_max_requests is not None and self.limit_max_requests_jitter:
+            self.limit_max_requests += random.randint(0, self.limit_max_requests_jitter)
+        super().load()
+
+
+def run(workers: int = None):
+    """
+    Run the API with uvicorn's multiprocess supervisor, which restarts workers that exit
+    (e.g. after LIMIT_MAX_REQUESTS) and forwards signals for graceful shutdown
+    """
+    workers = workers or settings.WORKERS
+    if database_settings.kiosk_mode:
+        # The local replica is a single SQLite file bootstrapped and synced from the worker lifespan
+        if workers > 1:
+            raise ValueError(f'KIOSK_MODE requires a single worker, got WORKERS={workers}')
+        workers = 1
+    workers = workers or settings.workers
+    # Spawned workers read the effective count to take their share of the DB_POOL_SIZE budget
+    os.environ['WORKERS'] = str(workers)
+    with get_logger(task='server') as logger:
+        logger.info(
+            f'Starting server on {settings.host}:{settings.port} with {workers} worker(s) '
+            f'(loop={settings.server_loop}, http={settings.server_http}, backlog={settings.backlog}, '
+            f'keep-alive={settings.keep_alive_timeout}s, max-requests={settings.limit_max_requests}'
+            f'+{settings.limit_max_requests_jitter})'
+        )
+    config = WorkerConfig(
+        'app.app:app',
+        host=settings.host,
+        port=settings.port,
+        workers=workers,
+        loop=settings.server_loop,
+        http=settings.server_http,
+        backlog=settings.backlog,
+        timeout_keep_alive=settings.keep_alive_timeout,
+        limit_concurrency=settings.limit_concurrency,
+        limit_max_requests=settings.limit_max_requests,
+        limit_max_requests_jitter=settings.limit_max_requests_jitter,
+        timeout_graceful_shutdown=settings.graceful_shutdown_timeout,
+    )
+    # Same dispatch as uvicorn.run, which only accepts keyword settings and not a Config instance
+    server = uvicorn.Server(config=config)
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == '__main__':
+    run()
@@ -1,9 +1,53 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 import sqlalchemy as sa
 from sqlalchemy.orm import registry, sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 
-from .settings import database_settings as settings
+from .settings import database_settings as settings, app_settings
 from .logger import LoggerHandler, get_logger, logger
+from .kiosk import KioskReplica
+
+
+# Statements issued while a capture is active (see DatabaseInterface.capture_statements)
+_captured_statements: ContextVar[list | None] = ContextVar('captured_statements', default=None)
+
+
+# Local replicas are read on every request: keep them in WAL mode with a large page cache and memory-mapped I/O
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'cache_size=-64000',
+    'mmap_size=268435456',
+    'busy_timeout=5000',
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record): # pylint: disable=unused-argument
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany): # pylint: disable=unused-argument, too-many-arguments
+    if _captured_statements.get() is not None:
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany): # pylint: disable=unused-argument, too-many-arguments
+    statements = _captured_statements.get()
+    if statements is None or not conn.info.get('query_start_time'):
+        return
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    statements.append({
+        'statement': statement,
+        'executemany': executemany,
+        'duration_ms': round(elapsed * 1000, 3),
+    })
 
 
 class DatabaseInterface:
@@ -33,13 +77,27 @@ class DatabaseInterface:
             try:
                 logger.debug('Creating database engine...')
                 logger.debug(f'Database URL: {settings.url}')
+                # The pool settings are a budget for the whole server: each worker takes an equal share.
+                # app.server exports the effective WORKERS; a process started otherwise counts as one
+                workers = max(app_settings.WORKERS, 1)
+                pool_size = max(settings.pool_size // workers, 1)
+                max_overflow = settings.max_overflow // workers
+                logger.debug(f'Connection pool: {pool_size} + {max_overflow} overflow ({workers} worker(s))')
                 self.engine = sa.create_engine(
                     settings.url,
-                    pool_size=200,
-                    max_overflow=100,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
                 )
+                self.pid = os.getpid()
+                if settings.is_sqlite:
+                    sa.event.listen(self.engine, 'connect', _set_sqlite_pragmas)
                 logger.info('Database engine established successfully.')
-                self.metadata_obj = sa.MetaData(schema=settings.DB_NAME)
+                self.replica = None
+                if settings.kiosk_mode:
+                    logger.debug('Kiosk mode enabled, bootstrapping local replica...')
+                    self.replica = KioskReplica(self.engine)
+                    self.replica.bootstrap()
+                self.metadata_obj = sa.MetaData(schema=settings.schema)
                 self.metadata_obj.reflect(bind=self.engine)
                 self.Base = declarative_base(metadata=self.metadata_obj)
                 self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine) # pylint: disable=invalid-name
@@ -62,6 +120,47 @@ class DatabaseInterface:
                 logger.exception(err_msg)
                 raise ValueError(err_msg)
 
+    def ensure_process_engine(self):
+        """
+        Make sure the connection pool belongs to the current process. app.server spawns its workers,
+        which import the app and create their own engine, so this is a no-op there; it only matters
+        for fork-based servers that import the app before forking (e.g. gunicorn --preload)
+        """
+        with get_logger(task="database") as logger:
+            if not hasattr(self, 'engine') or self.pid == os.getpid():
+                return
+            logger.debug(f'Engine inherited from process {self.pid}, resetting pool for process {os.getpid()}...')
+            self.engine.dispose(close=False)
+            if self.replica:
+                self.replica.primary_engine.dispose(close=False)
+            self.pid = os.getpid()
+            logger.info('Database connection pool reset for worker process.')
+
+    def enable_statement_capture(self):
+        """
+        Register the engine listeners used by capture_statements; only called when profiling is enabled
+        """
+        with get_logger(task="database") as logger:
+            if not hasattr(self, 'engine'):
+                logger.warning('Statement capture not enabled: database engine is not available.')
+                return
+            if not sa.event.contains(self.engine, 'before_cursor_execute', _before_cursor_execute):
+                sa.event.listen(self.engine, 'before_cursor_execute', _before_cursor_execute)
+                sa.event.listen(self.engine, 'after_cursor_execute', _after_cursor_execute)
+                logger.info('Statement capture enabled.')
+
+    @contextmanager
+    def capture_statements(self):
+        """
+        Collect the SQL statements issued in the current context into the yielded list
+        """
+        statements = []
+        token = _captured_statements.set(statements)
+        try:
+            yield statements
+        finally:
+            _captured_statements.reset(token)
+
     def get_declarative_base(self) -> registry:
         """
         Get the tables registry
@@ -0,0 +1,234 @@
+import time
+import asyncio
+from contextlib import contextmanager, nullcontext
+from datetime import datetime as dt
+import sqlalchemy as sa
+
+from .settings import database_settings as settings
+from .logger import get_logger
+
+
+# Name / key of the primary database lock serializing forced registrations from several kiosks
+PRIMARY_LOCK_NAME = 'semana_servidor_kiosk_push'
+PRIMARY_LOCK_KEY = 0x6B696F736B # 'kiosk'
+PRIMARY_LOCK_TIMEOUT = 10
+
+
+class KioskReplica:
+    """
+    Local SQLite replica of `pessoa` for check-in desks; validations made locally are journaled
+    and pushed in batches to the primary database when it is reachable. Bootstrap and sync are not
+    coordinated across processes, so a kiosk runs a single worker (enforced by app.server)
+    """
+    def __init__(self, local_engine: sa.engine.Engine):
+        self.local_engine = local_engine
+        self.primary_engine = sa.create_engine(settings.primary_url, pool_size=2, max_overflow=0, pool_pre_ping=True)
+        self.local_metadata = sa.MetaData()
+        self.journal = sa.Table(
+            'validacao_journal', self.local_metadata,
+            sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column('cpf', sa.String(32), nullable=False),
+            sa.Column('nome', sa.String(255)),
+            sa.Column('observacao', sa.String(255)),
+            sa.Column('matricula', sa.String(255)),
+            sa.Column('forced', sa.Boolean, nullable=False, default=False),
+            sa.Column('dataValidacao', sa.DateTime, nullable=False),
+            sa.Column('created_at', sa.DateTime, nullable=False),
+            sa.Column('synced_at', sa.DateTime, index=True),
+        )
+        self.local_pessoa = None
+        self.primary_pessoa = None
+        self.last_refresh = 0.0
+
+    def bootstrap(self):
+        """
+        Create the local tables and load `pessoa` from the primary; falls back to the existing local copy when offline
+        """
+        with get_logger(task='kiosk') as logger:
+            self.journal.create(self.local_engine, checkfirst=True)
+            try:
+                self.refresh()
+            except Exception as e: # pylint: disable=broad-exception-caught
+                if not sa.inspect(self.local_engine).has_table('pessoa'):
+                    err_msg = 'Kiosk replica unavailable: primary database unreachable and no local copy'
+                    logger.exception(err_msg)
+                    raise ValueError(err_msg) from e
+                logger.warning(f'Primary database unreachable, serving from local replica: {e}')
+
+    def get_primary_pessoa(self) -> sa.Table:
+        if self.primary_pessoa is None:
+            metadata = sa.MetaData(schema=settings.primary_schema)
+            self.primary_pessoa = sa.Table('pessoa', metadata, autoload_with=self.primary_engine)
+        return self.primary_pessoa
+
+    def get_local_pessoa(self) -> sa.Table:
+        if self.local_pessoa is None:
+            if sa.inspect(self.local_engine).has_table('pessoa'):
+                self.local_pessoa = sa.Table('pessoa', self.local_metadata, autoload_with=self.local_engine)
+            else:
+                self.local_pessoa = self.build_local_pessoa(self.get_primary_pessoa())
+                self.local_pessoa.create(self.local_engine)
+        return self.local_pessoa
+
+    def build_local_pessoa(self, primary_pessoa: sa.Table) -> sa.Table:
+        """
+        Mirror the primary table with generic types, so dialect specific options do not leak into SQLite
+        """
+        columns = []
+        for column in primary_pessoa.columns:
+            try:
+                column_type = column.type.as_generic()
+            except NotImplementedError:
+                column_type = column.type
+            if column.primary_key and isinstance(column_type, sa.Integer):
+                column_type = sa.Integer() # INTEGER PRIMARY KEY is the rowid alias, so ids are still generated
+            columns.append(sa.Column(column.name, column_type, primary_key=column.primary_key, nullable=column.nullable))
+        return sa.Table('pessoa', self.local_metadata, *columns, sa.Index('ix_pessoa_cpf', 'cpf'))
+
+    def journal_validation(self, session, pessoa, forced: bool = False):
+        """
+        Record a local validation in the same transaction that applies it
+        """
+        session.execute(self.journal.insert().values(
+            cpf=pessoa.cpf,
+            nome=pessoa.nome,
+            observacao=pessoa.observacao,
+            matricula=pessoa.matricula,
+            forced=forced,
+            dataValidacao=pessoa.dataValidacao,
+            created_at=dt.now(),
+        ))
+
+    def get_pending(self, connection, limit: int = None) -> list:
+        query = sa.select(self.journal).where(self.journal.c.synced_at.is_(None)).order_by(self.journal.c.id)
+        if limit:
+            query = query.limit(limit)
+        return connection.execute(query).mappings().all()
+
+    @staticmethod
+    def apply_validations(connection, pessoa: sa.Table, validations: list):
+        """
+        Apply journaled validations to a `pessoa` table; idempotent, the first validation of a CPF wins
+        """
+        if not validations:
+            return
+        forced = {v['cpf']: v for v in validations if v['forced']}
+        if forced:
+            # Conditional insert in a single statement: a CPF already registered is left untouched
+            columns = ('nome', 'cpf', 'dataValidacao', 'observacao', 'matricula')
+            new_pessoa = sa.select(
+                *(sa.bindparam(f'b_{name}', type_=pessoa.c[name].type) for name in columns),
+                sa.literal(0), sa.literal(0),
+            ).where(~sa.exists().where(pessoa.c.cpf == sa.bindparam('b_cpf'), pessoa.c.duplicado == 0))
+            connection.execute(
+                pessoa.insert().from_select([*columns, 'sorteado', 'duplicado'], new_pessoa),
+                [{f'b_{name}': v[name] for name in columns} for v in forced.values()],
+            )
+        connection.execute(
+            pessoa.update()
+            .where(pessoa.c.cpf == sa.bindparam('b_cpf'), pessoa.c.duplicado == 0, pessoa.c.dataValidacao.is_(None))
+            .values(dataValidacao=sa.bindparam('b_dataValidacao')),
+            [{'b_cpf': v['cpf'], 'b_dataValidacao': v['dataValidacao']} for v in validations],
+        )
+
+    @staticmethod
+    @contextmanager
+    def primary_lock(connection):
+        """
+        Serialize forced registrations across kiosks: without a unique constraint on `pessoa.cpf`, two
+        concurrent NOT EXISTS checks could both insert. The lock is session level, so it is held until
+        after the transaction commits. SQLite needs none, as it already serializes writers on the file
+        """
+        dialect = connection.dialect.name
+        if dialect == 'postgresql':
+            connection.execute(sa.text('SELECT pg_advisory_lock(:key)'), {'key': PRIMARY_LOCK_KEY})
+            unlock = sa.text('SELECT pg_advisory_unlock(:key)'), {'key': PRIMARY_LOCK_KEY}
+        elif dialect in ('mysql', 'mariadb'):
+            acquired = connection.execute(
+                sa.text('SELECT GET_LOCK(:name, :timeout)'), {'name': PRIMARY_LOCK_NAME, 'timeout': PRIMARY_LOCK_TIMEOUT}
+            ).scalar()
+            if acquired != 1:
+                connection.rollback()
+                raise TimeoutError('Could not acquire the kiosk push lock on the primary database')
+            unlock = sa.text('SELECT RELEASE_LOCK(:name)'), {'name': PRIMARY_LOCK_NAME}
+        else:
+            yield
+            return
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(*unlock)
+            connection.commit()
+
+    def push_pending(self) -> int:
+        """
+        Push one batch of pending validations to the primary, returning how many were synced
+        """
+        with get_logger(task='kiosk') as logger:
+            with self.local_engine.connect() as connection:
+                pending = self.get_pending(connection, limit=settings.kiosk_sync_batch_size)
+            if not pending:
+                return 0
+            try:
+                primary_pessoa = self.get_primary_pessoa()
+                with self.primary_engine.connect() as connection:
+                    with self.primary_lock(connection) if any(v['forced'] for v in pending) else nullcontext():
+                        with connection.begin():
+                            self.apply_validations(connection, primary_pessoa, pending)
+            except Exception as e: # pylint: disable=broad-exception-caught
+                logger.warning(f'Failed to push {len(pending)} validations to primary database: {e}')
+                return 0
+            # Rows are marked only after the primary commits; a crash in between re-pushes them, which is a no-op
+            with self.local_engine.begin() as connection:
+                connection.execute(
+                    self.journal.update()
+                    .where(self.journal.c.id.in_([v['id'] for v in pending]))
+                    .values(synced_at=dt.now())
+                )
+            logger.info(f'Pushed {len(pending)} validations to primary database.')
+            return len(pending)
+
+    def refresh(self):
+        """
+        Replace the local `pessoa` with a snapshot of the primary, re-applying validations not yet pushed
+        """
+        with get_logger(task='kiosk') as logger:
+            primary_pessoa = self.get_primary_pessoa()
+            local_pessoa = self.get_local_pessoa()
+            with self.primary_engine.connect() as connection:
+                rows = connection.execute(sa.select(primary_pessoa)).mappings().all()
+            columns = set(local_pessoa.c.keys())
+            snapshot = [{k: v for k, v in row.items() if k in columns} for row in rows]
+            with self.local_engine.begin() as connection:
+                connection.execute(local_pessoa.delete())
+                if snapshot:
+                    connection.execute(local_pessoa.insert(), snapshot)
+                self.apply_validations(connection, local_pessoa, self.get_pending(connection))
+            self.last_refresh = time.monotonic()
+            logger.info(f'Local replica refreshed with {len(snapshot)} records.')
+
+    def sync(self):
+        """
+        Push all pending validations, then refresh the local copy when it is due
+        """
+        while self.push_pending() == settings.kiosk_sync_batch_size:
+            pass
+        if time.monotonic() - self.last_refresh >= settings.kiosk_refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e: # pylint: disable=broad-exception-caught
+                with get_logger(task='kiosk') as logger:
+                    logger.warning(f'Failed to refresh local replica: {e}')
+
+    async def run(self):
+        """
+        Background synchronization loop, started from the application lifespan
+        """
+        while True:
+            await asyncio.sleep(settings.kiosk_sync_interval)
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception: # pylint: disable=broad-exception-caught
+                with get_logger(task='kiosk') as logger:
+                    logger.exception('Kiosk synchronization failed')
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime as dt
+from fastapi import Request
+from starlette.background import BackgroundTask
+
+from .settings import app_settings as settings
+from .logger import get_logger
+
+
+class SamplingProfiler:
+    """
+    Stack sampler for a single thread, producing folded stacks (flamegraph.pl / speedscope compatible)
+    """
+    def __init__(self, interval: float = 0.001, thread_id: int = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id) # pylint: disable=protected-access
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.items():
+                f.write(f'{stack} {count}\n')
+
+
+class DeterministicProfiler:
+    """
+    cProfile wrapper; the output can be loaded with pstats, snakeviz or flameprof
+    """
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path: str):
+        self.profile.dump_stats(path)
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request profiling, triggered by an admin API key in the profiling header or by sampling rate
+    """
+    MODES = ('sampling', 'deterministic')
+
+    def __init__(self, db_interface):
+        if settings.profiling_mode not in self.MODES:
+            raise ValueError(f'Invalid profiling mode: {settings.profiling_mode}')
+        self.db_interface = db_interface
+        self.db_interface.enable_statement_capture()
+        # Both profilers observe the whole event loop thread, so only one request is profiled at a time
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        os.makedirs(settings.profiling_dir, exist_ok=True)
+
+    def should_profile(self, request: Request) -> bool:
+        scopes = settings.api_key_scopes(request.headers.get(settings.profiling_header))
+        if scopes and 'admin' in scopes:
+            return True
+        return settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate
+
+    def create_profiler(self):
+        if settings.profiling_mode == 'sampling':
+            return SamplingProfiler(interval=settings.profiling_interval), 'folded'
+        return DeterministicProfiler(), 'prof'
+
+    async def dispatch(self, request: Request, call_next):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            # A busy profiler never delays nor fails the request: it is just served unprofiled
+            if not self.should_profile(request) or not self.lock.acquire(blocking=False):
+                return await call_next(request)
+            try:
+                return await self.profile(request, call_next)
+            finally:
+                self.lock.release()
+        finally:
+            self.in_flight -= 1
+
+    async def profile(self, request: Request, call_next):
+        with self.db_interface.capture_statements() as statements:
+            try:
+                profiler, extension = self.create_profiler()
+                profiler.start()
+            except Exception: # pylint: disable=broad-exception-caught
+                with get_logger(task='profiler') as logger:
+                    logger.exception('Failed to start profiler, serving request unprofiled')
+                return await call_next(request)
+
+            response = None
+            self.peak_in_flight = self.in_flight
+            start = time.perf_counter()
+            try:
+                response = await call_next(request)
+                return response
+            finally:
+                elapsed = time.perf_counter() - start
+                profile = self.finish(request, profiler, extension, response, elapsed, statements)
+                # Files are written off the event loop, once the response has been sent
+                if profile and response is not None and response.background is None:
+                    response.background = BackgroundTask(self.save, *profile)
+                elif profile:
+                    await self.save(*profile)
+
+    def finish(self, request: Request, profiler, extension: str, response, elapsed: float, statements: list):
+        """
+        Stop the profiler and collect the request metadata; returns None if profiling failed
+        """
+        with get_logger(task='profiler') as logger:
+            try:
+                profiler.stop()
+                route = request.scope.get('route')
+                route_path = route.path if route else request.url.path
+                slug = route_path.strip('/').replace('/', '_').replace('{', '').replace('}', '') or 'root'
+                basename = os.path.join(settings.profiling_dir, f'{dt.now().strftime("%Y%m%d_%H%M%S_%f")}_{request.method}_{slug}')
+                metadata = {
+                    'method': request.method,
+                    'route': route_path,
+                    'path': request.url.path,
+                    'status_code': response.status_code if response is not None else 500,
+                    'duration_ms': round(elapsed * 1000, 3),
+                    'mode': settings.profiling_mode,
+                    # The profile covers the whole event loop thread: with other requests in flight, their work is included
+                    'concurrent_requests': self.peak_in_flight - 1,
+                    'profile': f'{basename}.{extension}',
+                    'sql_count': len(statements),
+                    'sql_duration_ms': round(sum(s['duration_ms'] for s in statements), 3),
+                    'sql': statements,
+                }
+                return profiler, basename, metadata
+            except Exception: # pylint: disable=broad-exception-caught
+                logger.exception('Failed to stop request profiler')
+                return None
+
+    async def save(self, profiler, basename: str, metadata: dict):
+        await asyncio.to_thread(self.write, profiler, basename, metadata)
+
+    def write(self, profiler, basename: str, metadata: dict):
+        with get_logger(task='profiler') as logger:
+            try:
+                profiler.dump(metadata['profile'])
+                with open(f'{basename}.json', 'w', encoding='utf-8') as f:
+                    json.dump(metadata, f, ensure_ascii=False, indent=2)
+                self.prune()
+                logger.info(f'Profiled {metadata["method"]} {metadata["route"]} in {metadata["duration_ms"]} ms ({metadata["sql_count"]} SQL statements): {metadata["profile"]}')
+            except Exception: # pylint: disable=broad-exception-caught
+                logger.exception('Failed to save request profile')
+
+    def prune(self):
+        """
+        Keep at most PROFILING_MAX_FILES files in the profiling directory, removing the oldest first
+        """
+        files = sorted(f for f in os.listdir(settings.profiling_dir) if f.endswith(('.json', '.prof', '.folded')))
+        for filename in files[:max(len(files) - settings.profiling_max_files, 0)]:
+            os.remove(os.path.join(settings.profiling_dir, filename))
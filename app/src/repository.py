@@ -27,6 +27,7 @@ class PessoaRepository:
             if pessoa:
                 if not pessoa.dataValidacao:
                     pessoa.dataValidacao = dt.now()
+                    self.journal_validation(session, pessoa)
                     session.commit()
                     return False, sts
                 sts = "Servidor já validado"
@@ -41,9 +42,14 @@ class PessoaRepository:
                     matricula=sha256(cpf.encode()).hexdigest()
                 )
                 session.add(new_pessoa)
+                self.journal_validation(session, new_pessoa, forced=True)
                 session.commit()
                 return False, sts
             return True, sts
+
+    def journal_validation(self, session, pessoa, forced: bool = False):
+        if self.db_interface.replica:
+            self.db_interface.replica.journal_validation(session, pessoa, forced)
         
     def draw_random_pessoa(self):
         with self.db_interface.get_session() as session:
@@ -1,20 +1,11 @@
-from fastapi import APIRouter, HTTPException, status, Response, Security, Depends
-from fastapi.security.api_key import APIKeyHeader
+from fastapi import APIRouter, HTTPException, status, Response, Depends
 from .repository import PessoaRepository
-from .settings import app_settings
+from .security import verify_api_key, require_scope
 
-# Define the header where the API key will be passed
-api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
-
-# Function to verify the API key
-def verify_api_key(api_key: str = Security(api_key_header)):
-    if api_key == app_settings.security_token:
-        return api_key
-    raise HTTPException(
-        status_code=401,
-        detail="Invalid API Key",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# Scope required by each group of routes; any valid key is required by the router itself
+KIOSK = [Depends(require_scope("kiosk"))]
+STAGE = [Depends(require_scope("stage"))]
+ADMIN = [Depends(require_scope("admin"))]
 
 application_router = APIRouter(
     prefix="/api",
@@ -23,7 +14,7 @@ application_router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@application_router.get("/servidores")
+@application_router.get("/servidores", dependencies=ADMIN)
 async def get_government_employees():
     try:
         pessoas = PessoaRepository().get_pessoas()
@@ -33,7 +24,7 @@ async def get_government_employees():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nenhum servidor disponível")
     return {"message": "Lista de servidores na base", "data": pessoas}
 
-@application_router.get("/servidores/validados")
+@application_router.get("/servidores/validados", dependencies=STAGE)
 async def get_validated_government_employees():
     try:
         pessoas = PessoaRepository().get_validated_pessoas()
@@ -43,7 +34,7 @@ async def get_validated_government_employees():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nenhum servidor validado")
     return {"message": "Lista de servidores cadastrados pelo site", "data": pessoas}
 
-@application_router.get("/servidores/{cpf}")
+@application_router.get("/servidores/{cpf}", dependencies=KIOSK)
 async def get_government_employee(cpf: str):
     try:
         pessoa = PessoaRepository().get_pessoa(cpf)
@@ -53,7 +44,7 @@ async def get_government_employee(cpf: str):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Servidor não encontrado")
     return {"message": "Servidor encontrado", "data": pessoa}
 
-@application_router.post("/servidores/{cpf}/validar")
+@application_router.post("/servidores/{cpf}/validar", dependencies=KIOSK)
 async def validate_government_employee(cpf: str, force: bool = False, observation: str = 'terceirizado', name: str = ''):
     try:
         err, sts = PessoaRepository().validate_pessoa(cpf, force, observation, name)
@@ -66,7 +57,7 @@ async def validate_government_employee(cpf: str, force: bool = False, observatio
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=sts)
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Servidor não encontrado")
 
-@application_router.post("/sortear")
+@application_router.post("/sortear", dependencies=STAGE)
 async def draw_government_employee():
     try:
         pessoa_cpf = PessoaRepository().draw_random_pessoa()
@@ -78,7 +69,7 @@ async def draw_government_employee():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nenhum servidor disponível para sorteio")
     return {"message": "Servidor sorteado", "data": pessoa}
 
-@application_router.get("/sorteados")
+@application_router.get("/sorteados", dependencies=STAGE)
 async def get_drawn_government_employees():
     try:
         pessoas = PessoaRepository().get_draw_pessoa()
@@ -88,7 +79,7 @@ async def get_drawn_government_employees():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nenhum servidor sorteado")
     return {"message": "Lista de servidores sorteados", "data": pessoas}
 
-@application_router.post("/limpar/validados")
+@application_router.post("/limpar/validados", dependencies=ADMIN)
 async def clean_validated_government_employees():
     try:
         PessoaRepository().clean_validated()
@@ -96,7 +87,7 @@ async def clean_validated_government_employees():
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@application_router.post("/limpar/sorteio")
+@application_router.post("/limpar/sorteio", dependencies=ADMIN)
 async def clean_drawn_government_employees():
     try:
         PessoaRepository().clean_drawn()
@@ -104,7 +95,7 @@ async def clean_drawn_government_employees():
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@application_router.post("/limpar/pessoas-externas")
+@application_router.post("/limpar/pessoas-externas", dependencies=ADMIN)
 async def clean_external_government_employees():
     try:
         PessoaRepository().clean_external_pessoas()
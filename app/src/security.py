@@ -0,0 +1,37 @@
+from fastapi import HTTPException, Depends, Security, status
+from fastapi.security.api_key import APIKeyHeader
+
+from .settings import app_settings, database_settings
+
+# Define the header where the API key will be passed
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# Function to verify the API key, returning the scopes it grants; async so FastAPI runs it on the
+# event loop instead of dispatching it to the threadpool (it never blocks)
+async def verify_api_key(api_key: str = Security(api_key_header)) -> frozenset:
+    scopes = app_settings.api_key_scopes(api_key)
+    if scopes is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API Key",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return scopes
+
+# Route dependency checking a scope; it reuses the verify_api_key result cached for the request.
+# A kiosk only serves its local replica for lookups and validations, so other routes are unavailable there
+def require_scope(scope: str):
+    unavailable = database_settings.kiosk_mode and scope != "kiosk"
+
+    async def verify_scope(scopes: frozenset = Depends(verify_api_key)):
+        if unavailable:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Recurso indisponível no modo quiosque",
+            )
+        if scope not in scopes:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="API Key sem permissão para este recurso",
+            )
+    return verify_scope
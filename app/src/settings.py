@@ -1,17 +1,24 @@
-from typing import List
+from typing import List, Mapping
+from types import MappingProxyType
+from functools import cached_property
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field, field_validator, validator
+from pydantic import Field, field_validator, model_validator, validator
 from datetime import datetime as dt
 from hashlib import sha256
 import os
 import logging
 
 
+# 'admin' grants every scope
+API_SCOPES = ('kiosk', 'stage', 'admin')
+
+
 class AppSettings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         extra="ignore",
+        frozen=True,
     )
     HOST: str = '127.0.0.1'
     PROXY_PREFIX: str = ''
@@ -24,13 +31,51 @@ class AppSettings(BaseSettings):
     CORS_ALLOW_CREDENTIALS: bool = True
     CORS_ALLOW_METHODS: list[str]|str = Field(default=['*'])
     CORS_ALLOW_HEADERS: list[str]|str = Field(default=['*'])
-    SECURITY_TOKEN: str = 'secret'
+    SECURITY_TOKEN: str = '' # legacy key (clients send its sha256), granted the admin scope; disabled when empty
+    API_KEYS: list[str]|str = Field(default=[]) # 'scope[|scope]:sha256 hex of the key', comma separated
     DEFAULT_PROXY_URL: str = ''
     OPEN_API_URL: str = '/openapi.json'
+    WORKERS: int = 0 # 0 means one worker per available CPU
+    SERVER_LOOP: str = 'uvloop'
+    SERVER_HTTP: str = 'httptools'
+    KEEP_ALIVE_TIMEOUT: int = 5
+    BACKLOG: int = 2048
+    LIMIT_CONCURRENCY: int|None = None
+    LIMIT_MAX_REQUESTS: int|None = None # recycle a worker after this many requests
+    LIMIT_MAX_REQUESTS_JITTER: int|None = None # random extra requests per worker, defaults to half of LIMIT_MAX_REQUESTS
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
+    PROFILING_ENABLED: bool = False
+    PROFILING_MODE: str = 'sampling' # 'sampling' (folded stacks) or 'deterministic' (cProfile)
+    PROFILING_HEADER: str = 'X-Profile'
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_DIR: str = 'logs/profiles'
+    PROFILING_MAX_FILES: int = 200 # profiles and their JSON sidecars kept in PROFILING_DIR, oldest pruned first
 
     def __init__(self, **data):
         super().__init__(**data)
 
+    def model_post_init(self, __context):
+        # Settings are frozen, so values read on every request are computed once here and cached
+        for name in ('allowed_origins', 'allowed_methods', 'allowed_headers', 'security_token', 'api_keys'):
+            getattr(self, name)
+
+    @cached_property
+    def api_keys(self) -> Mapping[bytes, frozenset]:
+        """
+        Lookup table from sha256(presented key) to the scopes it grants
+        """
+        api_keys = {}
+        if self.SECURITY_TOKEN:
+            api_keys[sha256(self.security_token.encode()).digest()] = frozenset(API_SCOPES)
+        for entry in self.API_KEYS:
+            scopes, _, key_hash = entry.rpartition(':')
+            scopes = frozenset(scopes.split('|'))
+            if not scopes or not scopes.issubset(API_SCOPES) or len(key_hash) != 64:
+                raise ValueError(f'Invalid API key entry for scopes: {sorted(scopes)}')
+            api_keys[bytes.fromhex(key_hash)] = frozenset(API_SCOPES) if 'admin' in scopes else scopes
+        return MappingProxyType(api_keys)
+
     @validator('CORS_ALLOW_ORIGINS', 'CORS_ALLOW_METHODS', 'CORS_ALLOW_HEADERS', pre=True)
     def split_cors_values(cls, v):
         if isinstance(v, str):
@@ -38,6 +83,12 @@ class AppSettings(BaseSettings):
             return [item.strip() for item in v.split(',')]
         return v
 
+    @validator('API_KEYS', pre=True)
+    def split_api_keys(cls, v):
+        if isinstance(v, str):
+            return [item.strip() for item in v.split(',') if item.strip()]
+        return v
+
     @property
     def mode(self):
         return '' if self.MODE == 'prod' else f'-{self.MODE}'.upper()
@@ -80,26 +131,35 @@ class AppSettings(BaseSettings):
     def redoc_url(self):
         return '/api/redoc' if self.MODE == 'dev' else None
 
-    @property
+    @cached_property
     def allowed_origins(self):
-        return self.CORS_ALLOW_ORIGINS
+        return tuple(self.CORS_ALLOW_ORIGINS)
 
     @property
     def allowed_credentials(self):
         return self.CORS_ALLOW_CREDENTIALS
 
-    @property
+    @cached_property
     def allowed_methods(self):
-        return self.CORS_ALLOW_METHODS
+        return tuple(self.CORS_ALLOW_METHODS)
 
-    @property
+    @cached_property
     def allowed_headers(self):
-        return self.CORS_ALLOW_HEADERS
+        return tuple(self.CORS_ALLOW_HEADERS)
     
-    @property
+    @cached_property
     def security_token(self):
-        token = sha256(self.SECURITY_TOKEN.encode()).hexdigest()
-        return token
+        return sha256(self.SECURITY_TOKEN.encode()).hexdigest()
+
+    def api_key_scopes(self, api_key: str|None) -> frozenset|None:
+        """
+        Scopes granted to a presented API key, or None if the key is unknown
+        """
+        if not api_key:
+            return None
+        # The table is keyed by the digest of the presented key, so lookup time does not depend on
+        # how much of a stored key an attacker has guessed
+        return self.api_keys.get(sha256(api_key.encode()).digest())
     
     @property
     def default_proxy_url(self):
@@ -108,6 +168,84 @@ class AppSettings(BaseSettings):
     @property
     def openapi_url(self):
         return self.OPEN_API_URL
+
+    @property
+    def host(self):
+        return self.HOST
+
+    @property
+    def port(self):
+        return self.PORT
+
+    @property
+    def workers(self):
+        if self.WORKERS > 0:
+            return self.WORKERS
+        if hasattr(os, 'sched_getaffinity'):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+
+    @property
+    def server_loop(self):
+        return self.SERVER_LOOP
+
+    @property
+    def server_http(self):
+        return self.SERVER_HTTP
+
+    @property
+    def keep_alive_timeout(self):
+        return self.KEEP_ALIVE_TIMEOUT
+
+    @property
+    def backlog(self):
+        return self.BACKLOG
+
+    @property
+    def limit_concurrency(self):
+        return self.LIMIT_CONCURRENCY
+
+    @property
+    def limit_max_requests(self):
+        return self.LIMIT_MAX_REQUESTS
+
+    @property
+    def limit_max_requests_jitter(self):
+        if self.LIMIT_MAX_REQUESTS_JITTER is not None:
+            return self.LIMIT_MAX_REQUESTS_JITTER
+        return (self.LIMIT_MAX_REQUESTS or 0) // 2
+
+    @property
+    def graceful_shutdown_timeout(self):
+        return self.GRACEFUL_SHUTDOWN_TIMEOUT
+
+    @property
+    def profiling_enabled(self):
+        return self.PROFILING_ENABLED
+
+    @property
+    def profiling_mode(self):
+        return self.PROFILING_MODE
+
+    @property
+    def profiling_header(self):
+        return self.PROFILING_HEADER
+
+    @property
+    def profiling_sample_rate(self):
+        return self.PROFILING_SAMPLE_RATE
+
+    @property
+    def profiling_interval(self):
+        return self.PROFILING_INTERVAL
+
+    @property
+    def profiling_dir(self):
+        return self.PROFILING_DIR
+
+    @property
+    def profiling_max_files(self):
+        return self.PROFILING_MAX_FILES
     
 app_settings = AppSettings()
 
@@ -179,6 +317,7 @@ class DatabaseSettings(BaseSettings):
         env_file=".env",
         env_file_encoding="utf-8",
         extra="ignore",
+        hide_input_in_errors=True, # validation errors would otherwise echo DB_PASSWORD
     )
     DB_DRIVER: str = ''
     DB_USER: str = ''
@@ -187,12 +326,76 @@ class DatabaseSettings(BaseSettings):
     DB_PORT: str = ''
     DB_NAME: str = ''
     DB_OVERRIDE_URL: str|None = None
+    DB_POOL_SIZE: int = 200 # total for the server, split between its worker processes
+    DB_MAX_OVERFLOW: int = 100 # total for the server, split between its worker processes
+    # Kiosk mode: DB_OVERRIDE_URL is a local SQLite replica, synced with the primary database
+    KIOSK_MODE: bool = False
+    DB_PRIMARY_URL: str|None = None # defaults to the URL built from DB_DRIVER, DB_HOST, ...
+    KIOSK_SYNC_INTERVAL: float = 15.0
+    KIOSK_SYNC_BATCH_SIZE: int = 200
+    KIOSK_REFRESH_INTERVAL: float = 300.0
+
+    @model_validator(mode='after')
+    def check_kiosk_replica(self):
+        # The replica is wiped and reloaded on refresh, so it must never be the primary database
+        if self.KIOSK_MODE:
+            if not self.DB_OVERRIDE_URL or not self.DB_OVERRIDE_URL.startswith('sqlite'):
+                raise ValueError('KIOSK_MODE requires DB_OVERRIDE_URL to be a local SQLite database')
+            if self.DB_OVERRIDE_URL == self.primary_url:
+                raise ValueError('KIOSK_MODE requires DB_OVERRIDE_URL to differ from the primary database URL')
+        return self
 
     @property
     def url(self) -> str:
         if self.DB_OVERRIDE_URL:
             return self.DB_OVERRIDE_URL
+        return self.primary_url
+
+    @property
+    def primary_url(self) -> str:
+        if self.DB_PRIMARY_URL:
+            return self.DB_PRIMARY_URL
         return f"{self.DB_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith('sqlite')
+
+    @property
+    def schema(self) -> str|None:
+        return self.schema_for(self.url)
+
+    @property
+    def primary_schema(self) -> str|None:
+        return self.schema_for(self.primary_url)
+
+    def schema_for(self, url: str) -> str|None:
+        # SQLite has no schemas; the database name is only meaningful for server databases
+        return None if url.startswith('sqlite') else self.DB_NAME or None
+
+    @property
+    def kiosk_mode(self) -> bool:
+        return self.KIOSK_MODE
+
+    @property
+    def kiosk_sync_interval(self) -> float:
+        return self.KIOSK_SYNC_INTERVAL
+
+    @property
+    def kiosk_sync_batch_size(self) -> int:
+        return self.KIOSK_SYNC_BATCH_SIZE
+
+    @property
+    def kiosk_refresh_interval(self) -> float:
+        return self.KIOSK_REFRESH_INTERVAL
+
+    @property
+    def pool_size(self) -> int:
+        return self.DB_POOL_SIZE
+
+    @property
+    def max_overflow(self) -> int:
+        return self.DB_MAX_OVERFLOW
+
 
 database_settings = DatabaseSettings()
\ No newline at end of file
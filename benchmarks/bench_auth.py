@@ -0,0 +1,136 @@
+"""
+Measure the per-request overhead of API key verification: the previous implementation, which
+hashed SECURITY_TOKEN on every call, against the precomputed key table in AppSettings, with and
+without the per-route scope dependency.
+
+Every measurement is repeated; request batches are interleaved across routes, so drift affects them
+alike, and overheads are paired differences against a route without dependencies (median and min).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_auth --calls 100000 --requests 500 --repeat 15
+"""
+import os
+import time
+import random
+import asyncio
+import timeit
+import argparse
+import statistics
+from hashlib import sha256
+
+os.environ.setdefault('SECURITY_TOKEN', 'benchmark') # the legacy key is only registered when set
+
+import httpx # pylint: disable=wrong-import-position
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Security # pylint: disable=wrong-import-position
+
+from app.src.settings import app_settings as settings # pylint: disable=wrong-import-position
+from app.src.security import api_key_header, verify_api_key, require_scope # pylint: disable=wrong-import-position
+
+
+# Previous implementation, kept here as the baseline
+def legacy_verify_api_key(api_key: str = Security(api_key_header)):
+    if api_key == sha256(settings.SECURITY_TOKEN.encode()).hexdigest():
+        return api_key
+    raise HTTPException(status_code=401, detail="Invalid API Key")
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/none')
+    async def no_dependency():
+        return {}
+
+    legacy_router = APIRouter(prefix='/legacy', dependencies=[Security(legacy_verify_api_key)])
+
+    @legacy_router.get('/')
+    async def legacy():
+        return {}
+
+    # Router-level key verification only
+    auth_router = APIRouter(prefix='/auth', dependencies=[Depends(verify_api_key)])
+
+    @auth_router.get('/')
+    async def auth():
+        return {}
+
+    # Current layout: router-level key verification plus the route scope check
+    scoped_router = APIRouter(prefix='/scoped', dependencies=[Depends(verify_api_key)])
+
+    @scoped_router.get('/', dependencies=[Depends(require_scope('kiosk'))])
+    async def scoped():
+        return {}
+
+    app.include_router(legacy_router)
+    app.include_router(auth_router)
+    app.include_router(scoped_router)
+    return app
+
+
+def summary(values: list, scale: float, unit: str) -> str:
+    return f'median={statistics.median(values) * scale:8.1f} {unit}  min={min(values) * scale:8.1f} {unit}'
+
+
+def run(coroutine):
+    """
+    Drive a coroutine that never awaits, as FastAPI does for async dependencies, without an event loop
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as result:
+        return result.value
+    raise RuntimeError('Dependency suspended unexpectedly')
+
+
+def bench_calls(calls: int, repeat: int):
+    api_key = settings.security_token
+    verify_scope = require_scope('kiosk')
+    candidates = {
+        'legacy': lambda: legacy_verify_api_key(api_key),
+        'key': lambda: run(verify_api_key(api_key)),
+        'key+scope': lambda: run(verify_scope(run(verify_api_key(api_key)))),
+    }
+    print(f'Direct calls ({repeat} x {calls}):')
+    for name, func in candidates.items():
+        timings = [t / calls for t in timeit.repeat(func, number=calls, repeat=repeat)]
+        print(f'  {name:<10} {summary(timings, 1e9, "ns")}')
+
+
+async def bench_requests(requests: int, repeat: int):
+    paths = {'none': '/none', 'legacy': '/legacy/', 'key': '/auth/', 'key+scope': '/scoped/'}
+    timings = {name: [] for name in paths}
+    transport = httpx.ASGITransport(app=build_app())
+    headers = {'X-API-Key': settings.security_token}
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', headers=headers) as client:
+        for path in paths.values():
+            for _ in range(100):
+                assert (await client.get(path)).status_code == 200
+        for _ in range(repeat):
+            names = list(paths)
+            random.shuffle(names)
+            for name in names:
+                start = time.perf_counter()
+                for _ in range(requests):
+                    await client.get(paths[name])
+                timings[name].append((time.perf_counter() - start) / requests)
+
+    print(f'Requests through ASGITransport ({repeat} interleaved rounds x {requests}):')
+    print(f'  {"none":<10} {summary(timings["none"], 1e6, "us")}  (total per request)')
+    for name in ('legacy', 'key', 'key+scope'):
+        overhead = [t - base for t, base in zip(timings[name], timings['none'])]
+        print(f'  {name:<10} {summary(overhead, 1e6, "us")}  (overhead vs none)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=15)
+    args = parser.parse_args()
+
+    bench_calls(args.calls, args.repeat)
+    asyncio.run(bench_requests(args.requests, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare throughput of the server entry point (app.server) with 1 worker vs N workers on a
+database route, so the per-worker share of the connection pool (DB_POOL_SIZE / WORKERS) is exercised.
+
+Usage (from the repository root, with the database configured in .env):
+    python -m benchmarks.bench_workers --workers 1 4 --path /api/servidores/<cpf> --api-key <key>
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+import httpx
+
+from app.src.settings import app_settings as settings, database_settings
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = {**os.environ, 'WORKERS': str(workers), 'PORT': str(port), 'HOST': '127.0.0.1'}
+    return subprocess.Popen([sys.executable, '-m', 'app.server'], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'{base_url}/api', timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise TimeoutError(f'Server at {base_url} did not start in {timeout}s')
+
+
+async def load(base_url: str, api_key: str, method: str, path: str, concurrency: int, duration: float) -> tuple[int, int]:
+    headers = {'X-API-Key': api_key}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    completed, failed = 0, 0
+    deadline = time.monotonic() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits) as client:
+        async def user():
+            nonlocal completed, failed
+            while time.monotonic() < deadline:
+                try:
+                    response = await client.request(method, path)
+                    completed += 1
+                    failed += response.status_code >= 500
+                except httpx.HTTPError:
+                    failed += 1
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return completed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, settings.workers])
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--path', default='/api/servidores')
+    parser.add_argument('--api-key', default=settings.security_token)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        base_url = f'http://127.0.0.1:{args.port}'
+        server = start_server(workers, args.port)
+        try:
+            wait_until_ready(base_url)
+            completed, failed = asyncio.run(load(base_url, args.api_key, args.method, args.path, args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+        results.append((workers, completed / args.duration, failed))
+
+    baseline = results[0][1] or 1
+    print(f'{args.method} {args.path} - concurrency={args.concurrency}, duration={args.duration}s')
+    print(f'{"workers":>8} {"req/s":>10} {"speedup":>8} {"errors":>7} {"pool/worker":>12}')
+    for workers, rps, failed in results:
+        pool = f'{max(database_settings.pool_size // workers, 1)}+{database_settings.max_overflow // workers}'
+        print(f'{workers:>8} {rps:>10.1f} {rps / baseline:>7.2f}x {failed:>7} {pool:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+End-to-end check of the kiosk mode with two local SQLite files: a primary ("central") database
+and the kiosk replica. Covers lookups and validations served locally, journaled pushes, the
+primary going offline and coming back, an idempotent re-push, and the non-kiosk routes being refused.
+
+Usage (from the repository root):
+    python -m scripts.kiosk_e2e
+"""
+import os
+import sqlite3
+import tempfile
+
+WORKDIR = tempfile.mkdtemp(prefix='kiosk_e2e_')
+CENTRAL_DIR = os.path.join(WORKDIR, 'central')
+PRIMARY_DB = os.path.join(CENTRAL_DIR, 'primary.db')
+
+# Settings, logs and the database singleton are created at import time, so everything is set up first
+os.makedirs(CENTRAL_DIR)
+with sqlite3.connect(PRIMARY_DB) as primary:
+    primary.execute(
+        'CREATE TABLE pessoa (id INTEGER PRIMARY KEY, nome TEXT, cpf TEXT, dataValidacao DATETIME, '
+        'sorteado INTEGER, duplicado INTEGER, observacao TEXT, matricula TEXT)'
+    )
+    primary.executemany(
+        'INSERT INTO pessoa (nome, cpf, sorteado, duplicado, matricula) VALUES (?, ?, 0, 0, ?)',
+        [(f'Servidor {cpf}', cpf, f'M{cpf}') for cpf in ('111', '222', '333')],
+    )
+os.chdir(WORKDIR)
+os.environ.update(
+    KIOSK_MODE='true',
+    DB_OVERRIDE_URL=f'sqlite:///{os.path.join(WORKDIR, "kiosk.db")}',
+    DB_PRIMARY_URL=f'sqlite:///{PRIMARY_DB}',
+    KIOSK_SYNC_INTERVAL='3600', # synchronization is driven explicitly below
+    SECURITY_TOKEN='kiosk-e2e',
+)
+
+from fastapi.testclient import TestClient # pylint: disable=wrong-import-position
+from app.app import app # pylint: disable=wrong-import-position
+from app.src.settings import app_settings # pylint: disable=wrong-import-position
+from app.src.database import get_database_interface # pylint: disable=wrong-import-position
+
+
+def primary_validated() -> dict:
+    with sqlite3.connect(PRIMARY_DB) as primary:
+        return dict(primary.execute('SELECT cpf, dataValidacao FROM pessoa WHERE dataValidacao IS NOT NULL'))
+
+
+def primary_count() -> int:
+    with sqlite3.connect(PRIMARY_DB) as primary:
+        return primary.execute('SELECT COUNT(*) FROM pessoa').fetchone()[0]
+
+
+def main():
+    headers = {'X-API-Key': app_settings.security_token}
+    replica = get_database_interface().replica
+
+    with TestClient(app, headers=headers) as client:
+        # Lookups and validations are served by the local replica
+        assert client.get('/api/servidores/111').status_code == 200
+        assert client.post('/api/servidores/111/validar').status_code == 200
+        assert client.post('/api/servidores/111/validar').status_code == 409
+        assert client.post('/api/servidores/999/validar', params={'force': True, 'name': 'Externo'}).status_code == 200
+        assert client.get('/api/servidores/999').json()['data']['nome'] == 'Externo'
+        assert primary_validated() == {}
+
+        # Draws and clean-ups would diverge from the primary, so a kiosk refuses them
+        for path in ('/api/sortear', '/api/limpar/validados', '/api/limpar/sorteio', '/api/limpar/pessoas-externas'):
+            assert client.post(path).status_code == 503
+        assert client.get('/api/sorteados').status_code == 503
+
+        assert replica.push_pending() == 2
+        assert set(primary_validated()) == {'111', '999'}
+
+        # Primary goes offline: validations keep working locally and stay pending
+        os.rename(CENTRAL_DIR, f'{CENTRAL_DIR}_offline')
+        replica.primary_engine.dispose() # drop pooled connections, as a network failure would
+        assert client.post('/api/servidores/222/validar').status_code == 200
+        assert replica.push_pending() == 0
+
+        # Primary comes back: the next synchronization pushes the pending validation
+        os.rename(f'{CENTRAL_DIR}_offline', CENTRAL_DIR)
+        replica.sync()
+        validated = primary_validated()
+        assert set(validated) == {'111', '222', '999'}
+
+        # Pushing every journaled validation again changes nothing on the primary
+        with replica.local_engine.begin() as connection:
+            connection.execute(replica.journal.update().values(synced_at=None))
+        assert replica.push_pending() == 3
+        assert primary_validated() == validated
+        assert primary_count() == 4
+
+    print(f'Kiosk end-to-end scenario passed ({WORKDIR})')
+
+
+if __name__ == '__main__':
+    main()